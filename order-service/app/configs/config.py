@@ -11,7 +11,35 @@ class Settings(BaseSettings):
     RABBITMQ_URL: str = os.getenv("RABBITMQ_URL")
     REDIS_URL: str = os.getenv("REDIS_URL")
 
+    # Order storage: monthly partitions on created_at and cold archival
+    ORDER_PARTITIONING: bool = False
+    ORDER_PARTITION_MONTHS_AHEAD: int = 3
+    ORDER_ARCHIVE_AFTER_DAYS: int = 0  # 0 disables archival
+    ORDER_ARCHIVE_BACKEND: str = "table"  # "table" or "file"
+    ORDER_ARCHIVE_DIR: str = "archive"
+    ORDER_MAINTENANCE_INTERVAL_SECONDS: int = 86400
+
+    # Load shedding and circuit breakers around upstream dependencies
+    MAX_CONCURRENT_REQUESTS: int = 100
+    QUEUE_TIMEOUT_SECONDS: float = 0.5
+    REQUEST_TIMEOUT_SECONDS: float = 10.0
+    UPSTREAM_TIMEOUT_SECONDS: float = 5.0
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RECOVERY_SECONDS: float = 30.0
+
+    # Worker id for order numbers (0-1023); leased from Redis when unset
+    ORDER_WORKER_ID: int | None = None
+    ORDER_WORKER_LEASE_SECONDS: float = 30.0
+
+    # Consumer for order.status.* events from payment and shipping
+    ORDER_STATUS_CONSUMER: bool = True
+    ORDER_EVENTS_EXCHANGE: str = "order.events"
+    ORDER_STATUS_QUEUE: str = "order-service.order-status"
+    ORDER_STATUS_PREFETCH: int = 1000
+    ORDER_STATUS_BATCH_SIZE: int = 500
+    ORDER_STATUS_BATCH_WAIT_MS: int = 50
+
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
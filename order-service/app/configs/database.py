@@ -2,11 +2,24 @@ import os
 from sqlmodel import Session, create_engine, SQLModel 
 from app.configs.config import settings
 from app import models
+from app.utils.partitions import check_partitioned, ensure_partitions
+from app.utils.migrations import pending_migrations
+from app.utils.locks import advisory_lock, ORDER_MAINTENANCE_LOCK
 
 engine = create_engine(settings.DATABASE_URL, echo=True)
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    pending = pending_migrations(engine)
+    if pending:
+        raise RuntimeError(
+            f"Database schema is out of date, pending migrations: {pending}. "
+            "Run `python -m app.utils.migrations` before starting this version."
+        )
+    if settings.ORDER_PARTITIONING:
+        check_partitioned(engine)
+        with advisory_lock(engine, ORDER_MAINTENANCE_LOCK):
+            ensure_partitions(engine)
 
 if __name__ == "__main__":
     create_db_and_tables()
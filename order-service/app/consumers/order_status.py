@@ -0,0 +1,236 @@
+import asyncio
+import json
+from collections import Counter
+import aio_pika
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+from app.configs.config import settings
+from app.configs.database import engine
+from app.models import Order
+from app.utils.rollups import apply_status_deltas
+from app.utils.status_transitions import STATUS_TRANSITIONS, can_transition, is_ahead
+
+STATUS_ROUTING_KEY = "order.status.*"
+MAX_ORDER_NUMBER = (1 << 63) - 1
+
+# Outcomes of apply_batch for each event
+APPLIED = "applied"
+AHEAD = "ahead"
+REJECTED = "rejected"
+
+UPDATE_STATUSES_SQL = text("""
+UPDATE "order" AS o
+SET status = v.status
+FROM jsonb_to_recordset(CAST(:updates AS jsonb)) AS v(order_number bigint, status text)
+WHERE o.order_number = v.order_number
+""")
+
+class OrderStatusConsumer:
+    """Applies order.status.* events in micro-batches.
+
+    Messages are buffered until ORDER_STATUS_BATCH_SIZE have arrived or
+    ORDER_STATUS_BATCH_WAIT_MS has passed, then the whole batch is written with
+    one UPDATE and acknowledged only after the commit. An event whose status is
+    further along than the next step (e.g. shipped for a pending order) is
+    requeued once, since the step in between may still be in flight. Events
+    that are not allowed by STATUS_TRANSITIONS, or name an unknown order, go to
+    the dead-letter queue so they can be replayed.
+
+    When a batch fails, its events are retried one by one so a single bad event
+    cannot hold back the rest. An event that fails again after being redelivered
+    goes to the dead-letter queue instead of being requeued forever.
+    """
+
+    def __init__(self, engine, batch_size: int | None = None, batch_wait_ms: int | None = None):
+        self.engine = engine
+        self.batch_size = batch_size or settings.ORDER_STATUS_BATCH_SIZE
+        self.batch_wait = (batch_wait_ms or settings.ORDER_STATUS_BATCH_WAIT_MS) / 1000
+        self.pending: asyncio.Queue = asyncio.Queue()
+        self.batch_task: asyncio.Task | None = None
+        self.dead_letter_exchange = None
+        self.batches = 0
+        self.applied = 0
+        self.rejected = 0
+        self.requeued = 0
+        self.dead_lettered = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "batches": self.batches,
+            "applied": self.applied,
+            "rejected": self.rejected,
+            "requeued": self.requeued,
+            "dead_lettered": self.dead_lettered,
+            "buffered": self.pending.qsize(),
+        }
+
+    async def handle(self, message):
+        try:
+            body = json.loads(message.body)
+            order_number = int(body["order_number"])
+            status = body.get("status") or message.routing_key.rsplit(".", 1)[-1]
+            if not 0 < order_number <= MAX_ORDER_NUMBER:
+                raise ValueError(f"order_number {order_number} out of range")
+            if not isinstance(status, str) or status not in STATUS_TRANSITIONS:
+                raise ValueError(f"unknown status {status!r}")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"[DEBUG] Rejecting malformed order status event: {e}")
+            self.rejected += 1
+            await message.reject(requeue=False)
+            return
+        await self.pending.put((message, order_number, status))
+
+    def apply_batch(self, events: list[tuple[int, str]]) -> list[str]:
+        """Apply (order_number, status) events in arrival order; returns APPLIED, AHEAD or REJECTED for each"""
+        with Session(self.engine) as db:
+            rows = db.exec(
+                select(Order.order_number, Order.status, Order.user_id)
+                .where(Order.order_number.in_({order_number for order_number, _ in events}))
+                # Lock in a fixed order so concurrent batches from other workers can't deadlock
+                .order_by(Order.order_number)
+                .with_for_update()
+            ).all()
+            original = {order_number: status for order_number, status, _ in rows}
+            owners = {order_number: user_id for order_number, _, user_id in rows}
+            current = dict(original)
+
+            outcomes = []
+            for order_number, status in events:
+                if order_number not in current:
+                    outcomes.append(REJECTED)
+                elif can_transition(current[order_number], status):
+                    current[order_number] = status
+                    outcomes.append(APPLIED)
+                elif is_ahead(current[order_number], status):
+                    outcomes.append(AHEAD)
+                else:
+                    outcomes.append(REJECTED)
+
+            changed = {
+                order_number: status
+                for order_number, status in current.items()
+                if status != original[order_number]
+            }
+            if changed:
+                db.exec(UPDATE_STATUSES_SQL, params={"updates": json.dumps([
+                    {"order_number": order_number, "status": status}
+                    for order_number, status in changed.items()
+                ])})
+                deltas = Counter()
+                for order_number, status in changed.items():
+                    deltas[(owners[order_number], original[order_number])] -= 1
+                    deltas[(owners[order_number], status)] += 1
+                apply_status_deltas(db, deltas)
+            db.commit()
+        return outcomes
+
+    async def _next_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self.pending.get()]
+        deadline = loop.time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.pending.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def dead_letter(self, message, error: Exception | str):
+        if self.dead_letter_exchange is None:
+            await message.reject(requeue=False)
+            return
+        await self.dead_letter_exchange.publish(
+            aio_pika.Message(
+                message.body,
+                headers={"x-error": str(error)[:1000]},
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT
+            ),
+            routing_key=message.routing_key
+        )
+        await message.ack()
+
+    async def _flush(self, batch: list):
+        loop = asyncio.get_running_loop()
+        events = [(order_number, status) for _, order_number, status in batch]
+        try:
+            outcomes = await loop.run_in_executor(None, self.apply_batch, events)
+        except OperationalError as e:
+            # Database unreachable: not the events' fault, keep them for later
+            print(f"[DEBUG] Failed to apply order status batch, requeueing {len(batch)} events: {e}")
+            for message, _, _ in batch:
+                await message.nack(requeue=True)
+            await asyncio.sleep(1)
+            return
+        except Exception as e:
+            if len(batch) > 1:
+                print(f"[DEBUG] Failed to apply order status batch, retrying {len(batch)} events one by one: {e}")
+                for event in batch:
+                    await self._flush([event])
+                return
+            message, order_number, status = batch[0]
+            if message.redelivered:
+                print(f"[DEBUG] Dead-lettering status '{status}' for order {order_number}: {e}")
+                self.dead_lettered += 1
+                await self.dead_letter(message, e)
+            else:
+                print(f"[DEBUG] Failed to apply status '{status}' for order {order_number}, requeueing once: {e}")
+                await message.nack(requeue=True)
+            return
+        self.batches += 1
+        for (message, order_number, status), outcome in zip(batch, outcomes):
+            if outcome == APPLIED:
+                self.applied += 1
+                await message.ack()
+            elif outcome == AHEAD and not message.redelivered:
+                # The status in between may be in another worker's batch; try again once
+                self.requeued += 1
+                await message.nack(requeue=True)
+            else:
+                print(f"[DEBUG] Rejecting status '{status}' for order {order_number}")
+                self.rejected += 1
+                await self.dead_letter(message, f"transition to '{status}' not allowed")
+
+    async def run_batches(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                # e.g. acking on a channel that was reconnected; the broker redelivers those messages
+                print(f"[DEBUG] Failed to acknowledge order status batch: {e}")
+
+    async def start(self):
+        connection = await aio_pika.connect_robust(settings.RABBITMQ_URL)
+        channel = await connection.channel()
+        # Prefetch above the batch size so the next batch fills while the current one commits
+        await channel.set_qos(prefetch_count=settings.ORDER_STATUS_PREFETCH)
+        exchange = await channel.declare_exchange(
+            settings.ORDER_EVENTS_EXCHANGE, aio_pika.ExchangeType.TOPIC, durable=True
+        )
+        queue = await channel.declare_queue(settings.ORDER_STATUS_QUEUE, durable=True)
+        await queue.bind(exchange, routing_key=STATUS_ROUTING_KEY)
+        self.dead_letter_exchange = await channel.declare_exchange(
+            f"{settings.ORDER_EVENTS_EXCHANGE}.dead-letter", aio_pika.ExchangeType.TOPIC, durable=True
+        )
+        dead_letter_queue = await channel.declare_queue(f"{settings.ORDER_STATUS_QUEUE}.dead-letter", durable=True)
+        await dead_letter_queue.bind(self.dead_letter_exchange, routing_key="#")
+        if self.batch_task is None:
+            self.batch_task = asyncio.create_task(self.run_batches())
+        await queue.consume(self.handle)
+        print(f"[DEBUG] Consuming {STATUS_ROUTING_KEY} from {settings.ORDER_STATUS_QUEUE}")
+
+    async def run(self):
+        # connect_robust only reconnects after a first successful connection, so retry that here
+        while True:
+            try:
+                await self.start()
+                return
+            except Exception as e:
+                print(f"[DEBUG] Order status consumer failed to start, retrying in 5s: {e}")
+                await asyncio.sleep(5)
+
+order_status_consumer = OrderStatusConsumer(engine)
@@ -1,18 +1,25 @@
 from fastapi import FastAPI
 from app.configs.config import settings
-from app.configs.database import create_db_and_tables
-from app.routes import order
+import asyncio
+from app.configs.database import create_db_and_tables, engine
+from app.routes import order, metrics
 from app.utils.rate_limiter import init_rate_limiter
+from app.utils.archive import order_maintenance_loop
+from app.utils.load_shedding import LoadSheddingMiddleware
+from app.utils.order_number import init_order_number_generator, release_order_number_lease
+from app.consumers.order_status import order_status_consumer
 
 
 create_db_and_tables()
 
 app = FastAPI()
+app.add_middleware(LoadSheddingMiddleware)
 
 print(settings.DATABASE_URL)
 print(settings.PRODUCTS_API)
 
 app.include_router(order.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
@@ -21,6 +28,16 @@ async def root():
 @app.on_event("startup")
 async def startup_event():
     await init_rate_limiter()
+    await init_order_number_generator()
+    if settings.ORDER_PARTITIONING or settings.ORDER_ARCHIVE_AFTER_DAYS > 0:
+        asyncio.create_task(order_maintenance_loop(engine))
+    if settings.ORDER_STATUS_CONSUMER:
+        asyncio.create_task(order_status_consumer.run())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await release_order_number_lease()
+    await order.close_publisher()
 
 
 # To run this service on port 8001, use:
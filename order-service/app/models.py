@@ -1,22 +1,79 @@
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Relationship, Column, JSON
+from sqlalchemy import ForeignKeyConstraint, BigInteger, Index
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 from typing import Optional, List
+from app.configs.config import settings
+
+def partitioned(*args):
+    # With ORDER_PARTITIONING on, tables are range partitioned by month on created_at.
+    # Postgres requires the partition key in every unique constraint, hence the
+    # composite (id, created_at) primary keys below.
+    if settings.ORDER_PARTITIONING:
+        return (*args, {"postgresql_partition_by": "RANGE (created_at)"})
+    return args
 
 class Order(SQLModel, table=True):
-    id: int | None = Field(default=None, primary_key=True)
+    # Unique backstop for order numbers. Partitioned tables need created_at in the
+    # index; create_order derives created_at from the order number, so the pair
+    # is still unique per order number.
+    __table_args__ = partitioned(
+        Index(
+            "ix_order_order_number",
+            "order_number",
+            *(("created_at",) if settings.ORDER_PARTITIONING else ()),
+            unique=True,
+        ),
+    )
+
+    id: int | None = Field(default=None, primary_key=True, sa_column_kwargs={"autoincrement": True})
     user_id: str
-    order_number: int
+    order_number: int = Field(sa_type=BigInteger)
     status: str = Field(default="pending")
-    total_amount: str
+    total_amount: int = Field(sa_type=BigInteger)  # minor units (paisa)
     payment_method: str = Field(default="cash_on_delivery")
     shipping_address: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.now)
+    created_at: datetime = Field(default_factory=datetime.now, primary_key=True)
     items: List["OrderItem"] = Relationship(back_populates="order")
 
 class OrderItem(SQLModel, table=True):
-    id: int | None = Field(default=None, primary_key=True)
-    order_id: int = Field(foreign_key="order.id")
+    # created_at is copied from the parent order so an item always lands in the
+    # same monthly partition as its order.
+    __table_args__ = partitioned(
+        ForeignKeyConstraint(["order_id", "created_at"], ["order.id", "order.created_at"]),
+        # Postgres doesn't index foreign keys; loading and archiving an order's items needs this
+        Index("ix_orderitem_order_id_created_at", "order_id", "created_at"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True, sa_column_kwargs={"autoincrement": True})
+    order_id: int
+    created_at: datetime | None = Field(default=None, primary_key=True)
     product_id: int
     quantity: int
-    total_amt: int
-    order: Optional[Order] = Relationship(back_populates="items")
\ No newline at end of file
+    total_amt: int = Field(sa_type=BigInteger)  # minor units (paisa)
+    order: Optional[Order] = Relationship(back_populates="items")
+
+class OrderArchive(SQLModel, table=True):
+    # Cold storage for orders past ORDER_ARCHIVE_AFTER_DAYS; items are folded into a JSON column.
+    __tablename__ = "order_archive"
+
+    id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    user_id: str = Field(index=True)
+    order_number: int = Field(sa_type=BigInteger)
+    status: str
+    total_amount: int = Field(sa_type=BigInteger)
+    payment_method: str
+    shipping_address: Optional[str] = None
+    created_at: datetime
+    archived_at: datetime = Field(default_factory=datetime.now)
+    items: List[dict] = Field(default_factory=list, sa_column=Column(JSON))
+
+class UserOrderSummary(SQLModel, table=True):
+    # Per-user rollup, updated in the same transaction as create_order; see app/utils/rollups.py
+    __tablename__ = "user_order_summary"
+
+    user_id: str = Field(primary_key=True)
+    order_count: int = Field(default=0)
+    lifetime_total: int = Field(default=0, sa_type=BigInteger)  # minor units (paisa)
+    last_order_at: Optional[datetime] = None
+    status_counts: dict = Field(default_factory=dict, sa_column=Column(JSONB, nullable=False, server_default="{}"))
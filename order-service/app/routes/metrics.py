@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from app.consumers.order_status import order_status_consumer
+from app.utils.circuit_breaker import breakers
+from app.utils.load_shedding import load_shedder
+
+router = APIRouter(
+    prefix="/api/metrics",
+    tags=["Metrics"]
+)
+
+@router.get("/")
+async def get_metrics():
+    return {
+        "load_shedding": load_shedder.snapshot(),
+        "circuit_breakers": {name: breaker.snapshot() for name, breaker in breakers.items()},
+        "order_status_consumer": order_status_consumer.snapshot(),
+    }
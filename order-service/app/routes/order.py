@@ -1,15 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlmodel import Session, select
 from app.configs.database import get_db
-from app.models import Order, OrderItem
-from app.schemas.order import OrderCreate, OrderRead
+from app.models import Order, OrderItem, UserOrderSummary
+from app.schemas.order import OrderCreate, OrderRead, OrderSummaryRead
 from app.utils.verify_user import verify_user_token
 from app.configs.config import settings
+import asyncio
 import httpx
-import random
 import aio_pika
 import json
 from app.utils.rate_limiter import rate_limit
+from app.utils.archive import find_archived_order
+from app.utils.circuit_breaker import CircuitOpenError, products_breaker, rabbitmq_breaker
+from app.utils.load_shedding import request_deadline, time_remaining
+from app.utils.order_number import order_numbers, order_number_timestamp
+from app.utils.money import to_minor_units, to_major_units, format_amount
+from app.utils.rollups import record_order
 
 router = APIRouter(
     prefix="/api/orders",
@@ -24,7 +30,13 @@ async def get_current_user(request: Request):
         raise HTTPException(status_code=401, detail="Not authenticated")
     token = token_header.split(" ", 1)[1]
     print(f"[DEBUG] Extracted token: {token}")
-    user = await verify_user_token(token)
+    try:
+        user = await verify_user_token(token)
+    except CircuitOpenError:
+        raise HTTPException(status_code=503, detail="Auth service unavailable")
+    except httpx.HTTPError as e:
+        print(f"[DEBUG] Auth-service request failed: {e}")
+        raise HTTPException(status_code=503, detail="Auth service unavailable")
     print(f"[DEBUG] Auth-service response: {user}")
     if not user:
         print("[DEBUG] Invalid or expired token")
@@ -45,9 +57,40 @@ def build_shipping_address(user):
         )
     )
 
-async def publish_order_created(order_data: dict):
-    connection = await aio_pika.connect_robust(settings.RABBITMQ_URL)
-    channel = await connection.channel()
+async def fetch_product(client: httpx.AsyncClient, product_id: int):
+    product_resp = await client.get(
+        f"{settings.PRODUCTS_API}/{product_id}",
+        timeout=time_remaining(settings.UPSTREAM_TIMEOUT_SECONDS)
+    )
+    if product_resp.status_code >= 500:
+        product_resp.raise_for_status()
+    return product_resp.json()
+
+# One robust connection and channel per process, shared by every publish. A robust
+# connection reconnects by itself, so it is opened once rather than per order.
+publisher_connection: aio_pika.abc.AbstractRobustConnection | None = None
+publisher_channel: aio_pika.abc.AbstractChannel | None = None
+publisher_lock = asyncio.Lock()
+
+async def get_publisher_channel():
+    global publisher_connection, publisher_channel
+    async with publisher_lock:
+        if publisher_connection is None or publisher_connection.is_closed:
+            publisher_connection = await aio_pika.connect_robust(
+                settings.RABBITMQ_URL,
+                timeout=time_remaining(settings.UPSTREAM_TIMEOUT_SECONDS)
+            )
+            publisher_channel = None
+        if publisher_channel is None or publisher_channel.is_closed:
+            publisher_channel = await publisher_connection.channel()
+    return publisher_channel
+
+async def close_publisher():
+    if publisher_connection is not None and not publisher_connection.is_closed:
+        await publisher_connection.close()
+
+async def _publish(order_data: dict):
+    channel = await get_publisher_channel()
     message = aio_pika.Message(
         json.dumps(order_data).encode(),
         delivery_mode=aio_pika.DeliveryMode.PERSISTENT
@@ -56,9 +99,27 @@ async def publish_order_created(order_data: dict):
         message,
         routing_key="order.created"
     )
-    await connection.close()
     print(f"[DEBUG] Published order.created event: {order_data}")
 
+async def publish_order_created(order_data: dict):
+    await rabbitmq_breaker.call(_publish, order_data)
+
+# Strong references to in-flight order.created publishes
+publish_tasks: set[asyncio.Task] = set()
+
+async def _publish_in_background(order_data: dict):
+    # Not bound by the request deadline: the response has already gone out
+    request_deadline.set(None)
+    try:
+        await asyncio.wait_for(publish_order_created(order_data), settings.UPSTREAM_TIMEOUT_SECONDS)
+    except Exception as e:
+        print(f"[DEBUG] Failed to publish order.created event: {e}")
+
+def publish_order_created_later(order_data: dict):
+    task = asyncio.create_task(_publish_in_background(order_data))
+    publish_tasks.add(task)
+    task.add_done_callback(publish_tasks.discard)
+
 @router.post("/", response_model=OrderRead, status_code=201, dependencies=[Depends(rate_limit(times=5, seconds=60))])
 async def create_order(order: OrderCreate, request: Request, db: Session = Depends(get_db), user=Depends(get_current_user)):
     # Fetch product details and calculate totals
@@ -67,8 +128,13 @@ async def create_order(order: OrderCreate, request: Request, db: Session = Depen
     order_items_data = []
     async with httpx.AsyncClient() as client:
         for item in order.items:
-            product_resp = await client.get(f"{settings.PRODUCTS_API}/{item.product_id}")
-            product = product_resp.json()
+            try:
+                product = await products_breaker.call(fetch_product, client, item.product_id)
+            except CircuitOpenError:
+                raise HTTPException(status_code=503, detail="Products API unavailable")
+            except (httpx.HTTPError, ValueError) as e:
+                print(f"[DEBUG] Product API request failed: {e}")
+                raise HTTPException(status_code=503, detail="Products API unavailable")
             print(f"[DEBUG] Product API response: {product}")
             if (
                 not isinstance(product, dict)
@@ -77,44 +143,68 @@ async def create_order(order: OrderCreate, request: Request, db: Session = Depen
             ):
                 raise HTTPException(status_code=502, detail=f"Invalid product data for product_id {item.product_id}: {product}")
             price = product["product"]["price"]
-            total_amt = price * item.quantity
+            total_amt = to_minor_units(price) * item.quantity
             total_amount += total_amt
             items.append(OrderItem(product_id=item.product_id, quantity=item.quantity, total_amt=total_amt))
             order_items_data.append({
                 "product_id": item.product_id,
                 "quantity": item.quantity,
                 "price": price,
-                "total_amt": total_amt
+                "total_amt": to_major_units(total_amt)
             })
-    # Generate order_number (example: random 6-digit)
-    order_number = random.randint(100000, 999999)
+    # Unique, time-sortable order number allocated locally (see app/utils/order_number.py)
+    try:
+        order_number = order_numbers.next_id()
+    except RuntimeError as e:
+        # The worker id lease could not be renewed, so this id may now belong to another process
+        print(f"[DEBUG] Order number allocation failed: {e}")
+        raise HTTPException(status_code=503, detail="Order numbers unavailable")
     shipping_address = build_shipping_address(user)
     db_order = Order(
         user_id=str(user["user_id"]),
         order_number=order_number,
-        total_amount=str(total_amount),
+        total_amount=total_amount,
         shipping_address=shipping_address,
-        items=items
+        items=items,
+        # Same instant as the order number, in the naive local time used elsewhere
+        created_at=order_number_timestamp(order_number).astimezone().replace(tzinfo=None)
     )
     db.add(db_order)
+    record_order(db, db_order)
     db.commit()
     db.refresh(db_order)
+    # The order exists now: answer 201 even if the request deadline passes before
+    # the response is sent, or a client retry would create a duplicate order
+    request.state.finish_past_deadline = True
 
-    # Publish event for email notification
-    await publish_order_created({
-        "order_number": db_order.order_number,
+    # Publish event for email notification in the background, so a slow or
+    # unavailable broker neither delays the response nor turns it into a 504
+    publish_order_created_later({
+        # Sent as a string: 63-bit order numbers exceed JavaScript's safe integer range
+        "order_number": str(db_order.order_number),
         "user_email": user["email"],
         "user_name": f"{user.get('first_name', '')} {user.get('last_name', '')}",
-        "total_amount": db_order.total_amount,
+        "total_amount": format_amount(db_order.total_amount),
         "items": order_items_data,
         "payment_method": db_order.payment_method
     })
 
     return db_order
 
+@router.get("/summary", response_model=OrderSummaryRead)
+def get_order_summary(db: Session = Depends(get_db), user=Depends(get_current_user)):
+    user_id = str(user["user_id"])
+    summary = db.get(UserOrderSummary, user_id)
+    if not summary:
+        return OrderSummaryRead(user_id=user_id)
+    return summary
+
 @router.get("/{order_id}", response_model=OrderRead)
 def get_order(order_id: int, db: Session = Depends(get_db)):
     order = db.exec(select(Order).where(Order.id == order_id)).first()
+    if not order:
+        # Older orders live in the archive store once moved out of the hot tables
+        order = find_archived_order(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
@@ -1,11 +1,14 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, computed_field
+from typing import Optional, List, Dict
 from datetime import datetime
+from app.utils.money import to_major_units
+
+# Totals are stored in paisa. The original total_amt/total_amount fields keep
+# returning rupees; the stored values are exposed as *_minor.
 
 class OrderItemBase(BaseModel):
     product_id: int
     quantity: int
-    total_amt: int
 
 class OrderItemCreate(BaseModel):
     product_id: int
@@ -14,6 +17,12 @@ class OrderItemCreate(BaseModel):
 class OrderItemRead(OrderItemBase):
     id: int
     order_id: int
+    total_amt_minor: int = Field(validation_alias="total_amt")
+
+    @computed_field
+    @property
+    def total_amt(self) -> int | float:
+        return to_major_units(self.total_amt_minor)
 
     class Config:
         orm_mode = True
@@ -22,10 +31,15 @@ class OrderBase(BaseModel):
     user_id: str
     order_number: int
     status: str
-    total_amount: str
+    total_amount_minor: int = Field(validation_alias="total_amount")
     payment_method: str = "cash_on_delivery"
     shipping_address: Optional[str] = None
 
+    @computed_field
+    @property
+    def total_amount(self) -> str:
+        return str(to_major_units(self.total_amount_minor))
+
 class OrderCreate(BaseModel):
     items: List[OrderItemCreate]
 
@@ -36,3 +50,13 @@ class OrderRead(OrderBase):
 
     class Config:
         orm_mode = True
+
+class OrderSummaryRead(BaseModel):
+    user_id: str
+    order_count: int = 0
+    lifetime_total: int = 0
+    last_order_at: Optional[datetime] = None
+    status_counts: Dict[str, int] = {}
+
+    class Config:
+        orm_mode = True
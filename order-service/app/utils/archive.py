@@ -0,0 +1,185 @@
+import asyncio
+import gzip
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+from sqlmodel import Session, select, delete
+from sqlalchemy.orm import selectinload
+from app.configs.config import settings
+from app.models import Order, OrderItem, OrderArchive
+from app.utils.partitions import ensure_partitions, drop_partitions_before
+from app.utils.locks import advisory_lock, ORDER_MAINTENANCE_LOCK
+
+ARCHIVE_BATCH_SIZE = 500
+
+def order_to_record(order: Order) -> dict:
+    return {
+        "id": order.id,
+        "user_id": order.user_id,
+        "order_number": order.order_number,
+        "status": order.status,
+        "total_amount": order.total_amount,
+        "payment_method": order.payment_method,
+        "shipping_address": order.shipping_address,
+        "created_at": order.created_at.isoformat(),
+        "items": [
+            {
+                "id": item.id,
+                "order_id": item.order_id,
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "total_amt": item.total_amt,
+            }
+            for item in order.items
+        ],
+    }
+
+class TableArchiveStore:
+    """Keeps archived orders in the order_archive table, one row per order"""
+
+    def put_many(self, db: Session, records: list[dict]):
+        for record in records:
+            db.add(OrderArchive(**{**record, "created_at": datetime.fromisoformat(record["created_at"])}))
+
+    def get(self, db: Session, order_id: int) -> dict | None:
+        archived = db.get(OrderArchive, order_id)
+        if not archived:
+            return None
+        return archived.model_dump(exclude={"archived_at"})
+
+class FileArchiveStore:
+    """Keeps archived orders as gzipped JSON lines, bucketed by order id.
+
+    Each file holds at most FILE_BUCKET_SIZE consecutive ids, so a lookup opens
+    exactly one small file (or none, when the bucket was never written) and
+    never scans more than one bucket's records. Files are never appended to in
+    place: a write copies the bucket to a temp file and renames it over the old
+    one, so a crash mid-write leaves the previous file intact.
+    """
+
+    FILE_BUCKET_SIZE = 256
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _bucket_path(self, bucket: int) -> str:
+        return os.path.join(self.directory, f"{bucket // 1000:06d}", f"orders-{bucket}.jsonl.gz")
+
+    def put_many(self, db: Session, records: list[dict]):
+        by_bucket: dict[int, list[dict]] = {}
+        for record in records:
+            by_bucket.setdefault(record["id"] // self.FILE_BUCKET_SIZE, []).append(record)
+        for bucket, bucket_records in by_bucket.items():
+            path = self._bucket_path(bucket)
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            try:
+                with open(tmp_path, "wb") as raw:
+                    if os.path.exists(path):
+                        with open(path, "rb") as existing:
+                            raw.write(existing.read())
+                    with gzip.GzipFile(fileobj=raw, mode="ab") as f:
+                        for record in bucket_records:
+                            f.write((json.dumps(record) + "\n").encode())
+                    raw.flush()
+                    os.fsync(raw.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            # Make the rename itself durable before the hot rows are deleted
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def get(self, db: Session, order_id: int) -> dict | None:
+        path = self._bucket_path(order_id // self.FILE_BUCKET_SIZE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with gzip.open(path, "rt") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record["id"] == order_id:
+                        return record
+        except (OSError, EOFError, zlib.error, ValueError) as e:
+            print(f"[DEBUG] Archive file {path} is unreadable past some point: {e}")
+        return None
+
+def get_archive_store():
+    if settings.ORDER_ARCHIVE_BACKEND == "file":
+        return FileArchiveStore(settings.ORDER_ARCHIVE_DIR)
+    return TableArchiveStore()
+
+def find_archived_order(db: Session, order_id: int) -> dict | None:
+    return get_archive_store().get(db, order_id)
+
+def archive_orders(engine, older_than_days: int | None = None) -> int:
+    """Move orders older than the horizon out of the hot tables into the archive store.
+
+    Callers must hold ORDER_MAINTENANCE_LOCK (see run_order_maintenance). Each
+    batch is written (and fsynced) to the store before the hot rows are deleted and committed,
+    so a crash in between leaves a duplicate archive record rather than a lost order.
+    """
+    if older_than_days is None:
+        older_than_days = settings.ORDER_ARCHIVE_AFTER_DAYS
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    store = get_archive_store()
+    archived = 0
+    while True:
+        with Session(engine) as db:
+            orders = db.exec(
+                select(Order)
+                .where(Order.created_at < cutoff)
+                .order_by(Order.created_at)
+                .limit(ARCHIVE_BATCH_SIZE)
+                .options(selectinload(Order.items))
+                # Keeps the status consumer from changing an order while it is being moved
+                .with_for_update(of=Order, skip_locked=True)
+            ).all()
+            if not orders:
+                break
+            store.put_many(db, [order_to_record(order) for order in orders])
+            ids = [order.id for order in orders]
+            # created_at lets Postgres prune to the partitions holding these orders
+            created = {order.created_at for order in orders}
+            db.exec(delete(OrderItem).where(OrderItem.order_id.in_(ids), OrderItem.created_at.in_(created)))
+            db.exec(delete(Order).where(Order.id.in_(ids), Order.created_at.in_(created)))
+            db.commit()
+            archived += len(orders)
+    if settings.ORDER_PARTITIONING:
+        drop_partitions_before(engine, cutoff)
+    print(f"[DEBUG] Archived {archived} orders created before {cutoff.isoformat()}")
+    return archived
+
+def run_order_maintenance(engine):
+    # Every worker and instance runs this loop; only one pass may run at a time
+    with advisory_lock(engine, ORDER_MAINTENANCE_LOCK, wait=False) as acquired:
+        if not acquired:
+            print("[DEBUG] Order maintenance already running elsewhere, skipping")
+            return
+        if settings.ORDER_PARTITIONING:
+            ensure_partitions(engine)
+        if settings.ORDER_ARCHIVE_AFTER_DAYS > 0:
+            archive_orders(engine)
+
+async def order_maintenance_loop(engine):
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(settings.ORDER_MAINTENANCE_INTERVAL_SECONDS)
+        try:
+            await loop.run_in_executor(None, run_order_maintenance, engine)
+        except Exception as e:
+            print(f"[DEBUG] Order maintenance failed: {e}")
+
+# To archive old orders once (e.g. from cron), use:
+# python -m app.utils.archive
+
+if __name__ == "__main__":
+    from app.configs.database import engine
+    run_order_maintenance(engine)
@@ -0,0 +1,91 @@
+import time
+from app.configs.config import settings
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str):
+        super().__init__(f"Circuit '{name}' is open")
+        self.name = name
+
+class CircuitBreaker:
+    """Stops calling an upstream after repeated failures.
+
+    closed: calls go through, consecutive failures are counted.
+    open: calls fail fast with CircuitOpenError until recovery_timeout has passed.
+    half_open: a single trial call is let through; success closes the circuit,
+    failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int | None = None, recovery_timeout: float | None = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.BREAKER_FAILURE_THRESHOLD
+        self.recovery_timeout = recovery_timeout or settings.BREAKER_RECOVERY_SECONDS
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def _before_call(self):
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(self.name)
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self.trial_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(self.name)
+            self.trial_in_flight = True
+
+    def record_success(self):
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+        if self.state != self.CLOSED:
+            print(f"[DEBUG] Circuit '{self.name}' closed")
+        self.state = self.CLOSED
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                print(f"[DEBUG] Circuit '{self.name}' opened after {self.consecutive_failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    async def call(self, func, *args, **kwargs):
+        self._before_call()
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException:
+            # Cancellation (e.g. a request deadline) counts too: the upstream did not answer in time
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+        }
+
+products_breaker = CircuitBreaker("products_api")
+auth_breaker = CircuitBreaker("auth_service")
+rabbitmq_breaker = CircuitBreaker("rabbitmq")
+
+breakers = {
+    breaker.name: breaker
+    for breaker in (products_breaker, auth_breaker, rabbitmq_breaker)
+}
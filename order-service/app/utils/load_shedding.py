@@ -0,0 +1,126 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from fastapi.responses import JSONResponse
+from app.configs.config import settings
+
+# Monotonic time by which the current request must finish, set by LoadSheddingMiddleware
+request_deadline: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+def time_remaining(default: float) -> float:
+    """Timeout for an upstream call: the default, capped by what is left of the request deadline"""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return default
+    return max(min(default, deadline - time.monotonic()), 0.01)
+
+class LoadShedder:
+    def __init__(self, max_concurrency: int, queue_timeout: float, request_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.queued = 0
+        self.shed = 0
+        self.timed_out = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+        }
+
+load_shedder = LoadShedder(
+    settings.MAX_CONCURRENT_REQUESTS,
+    settings.QUEUE_TIMEOUT_SECONDS,
+    settings.REQUEST_TIMEOUT_SECONDS,
+)
+
+class LoadSheddingMiddleware:
+    """Caps concurrent requests and enforces a per-request deadline.
+
+    A request that waits longer than the queue budget for a slot gets a 503
+    straight away instead of piling up behind slow upstreams. One that runs past
+    its deadline is answered with a 504, but keeps its slot until the handler
+    actually returns: sync endpoints run in the threadpool and cannot be
+    cancelled, so freeing the slot early would let their DB sessions pile up.
+    Handlers that must not be answered with a 504 once they have committed set
+    request.state.finish_past_deadline.
+    """
+
+    def __init__(self, app, shedder: LoadShedder = load_shedder, exempt_paths: tuple[str, ...] = ("/api/metrics",)):
+        self.app = app
+        self.shedder = shedder
+        self.exempt_paths = exempt_paths
+        # Strong references to handler tasks, which may outlive the request after a 504
+        self.overdue: set[asyncio.Task] = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt_paths):
+            await self.app(scope, receive, send)
+            return
+
+        shedder = self.shedder
+        started = time.monotonic()
+        shedder.queued += 1
+        try:
+            await asyncio.wait_for(shedder.semaphore.acquire(), shedder.queue_timeout)
+        except asyncio.TimeoutError:
+            shedder.shed += 1
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Service overloaded, try again later"},
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        finally:
+            shedder.queued -= 1
+
+        response_started = False
+        timed_out = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if timed_out and not response_started:
+                # The client already got a 504; drop the late response
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        def finished(task: asyncio.Task):
+            shedder.in_flight -= 1
+            shedder.semaphore.release()
+            self.overdue.discard(task)
+            if timed_out and not task.cancelled() and task.exception() is not None:
+                print(f"[DEBUG] Request failed after its deadline: {task.exception()}")
+
+        deadline = started + shedder.request_timeout
+        token = request_deadline.set(deadline)
+        shedder.in_flight += 1
+        try:
+            # The task copies the current context, so handlers see request_deadline
+            task = asyncio.ensure_future(self.app(scope, receive, send_wrapper))
+        finally:
+            request_deadline.reset(token)
+        self.overdue.add(task)
+        task.add_done_callback(finished)
+
+        await asyncio.wait({task}, timeout=deadline - time.monotonic())
+        if task.done():
+            task.result()
+            return
+        shedder.timed_out += 1
+        if response_started or scope.get("state", {}).get("finish_past_deadline"):
+            # Too late to answer with a 504 (the response is under way, or the
+            # handler already committed its side effects), let the response finish
+            await task
+            return
+        timed_out = True
+        response = JSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
+        await response(scope, receive, send)
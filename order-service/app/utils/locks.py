@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+from sqlalchemy import text
+
+# Keys for Postgres advisory locks shared by every worker and instance
+MIGRATIONS_LOCK = 726001
+ORDER_MAINTENANCE_LOCK = 726002
+
+@contextmanager
+def advisory_lock(engine, key: int, wait: bool = True):
+    """Hold a session-level advisory lock for the duration of the block.
+
+    Yields whether the lock was acquired; with wait=False another holder means
+    False instead of blocking.
+    """
+    with engine.connect() as conn:
+        if wait:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": key})
+            acquired = True
+        else:
+            acquired = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar()
+        conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": key})
+                conn.commit()
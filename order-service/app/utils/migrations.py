@@ -0,0 +1,125 @@
+from sqlalchemy import text
+from app.utils.locks import advisory_lock, MIGRATIONS_LOCK
+
+# create_all only creates missing tables, so schema changes to existing tables
+# live here. Each migration is (name, is_pending(conn), apply(conn)) and must be
+# safe to check repeatedly.
+
+def column_exists(conn, table: str, column: str) -> bool:
+    return conn.execute(text(
+        "SELECT 1 FROM information_schema.columns WHERE table_name = :table AND column_name = :column"
+    ), {"table": table, "column": column}).first() is not None
+
+def constraint_name(conn, table: str, kind: str) -> str | None:
+    return conn.execute(text(
+        "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = :kind"
+    ), {"table": f'"{table}"', "kind": kind}).scalar()
+
+def order_item_keys_pending(conn) -> bool:
+    return column_exists(conn, "orderitem", "id") and not column_exists(conn, "orderitem", "created_at")
+
+def migrate_order_item_keys(conn):
+    """Copy each order's created_at onto its items and key both tables on (id, created_at)"""
+    conn.execute(text("ALTER TABLE orderitem ADD COLUMN created_at TIMESTAMP WITHOUT TIME ZONE"))
+    conn.execute(text(
+        'UPDATE orderitem AS i SET created_at = o.created_at FROM "order" AS o WHERE o.id = i.order_id'
+    ))
+    conn.execute(text("ALTER TABLE orderitem ALTER COLUMN created_at SET NOT NULL"))
+    foreign_key = constraint_name(conn, "orderitem", "f")
+    if foreign_key:
+        conn.execute(text(f'ALTER TABLE orderitem DROP CONSTRAINT "{foreign_key}"'))
+    for table in ("order", "orderitem"):
+        conn.execute(text(f'ALTER TABLE "{table}" DROP CONSTRAINT "{constraint_name(conn, table, "p")}"'))
+        conn.execute(text(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, created_at)'))
+    conn.execute(text(
+        'ALTER TABLE orderitem ADD FOREIGN KEY (order_id, created_at) REFERENCES "order" (id, created_at)'
+    ))
+
+def column_type(conn, table: str, column: str) -> str | None:
+    return conn.execute(text(
+        "SELECT data_type FROM information_schema.columns WHERE table_name = :table AND column_name = :column"
+    ), {"table": table, "column": column}).scalar()
+
+def order_number_bigint_pending(conn) -> bool:
+    return column_type(conn, "order", "order_number") == "integer"
+
+def migrate_order_number_bigint(conn):
+    """Widen order_number for 63-bit Snowflake order numbers"""
+    conn.execute(text('ALTER TABLE "order" ALTER COLUMN order_number TYPE BIGINT'))
+
+def order_totals_pending(conn) -> bool:
+    return column_type(conn, "order", "total_amount") == "character varying"
+
+def migrate_order_totals(conn):
+    """Convert string/major-unit totals to BIGINT minor units (paisa)"""
+    conn.execute(text(
+        'ALTER TABLE "order" ALTER COLUMN total_amount TYPE BIGINT '
+        "USING ROUND(total_amount::numeric * 100)"
+    ))
+    conn.execute(text(
+        "ALTER TABLE orderitem ALTER COLUMN total_amt TYPE BIGINT USING total_amt::bigint * 100"
+    ))
+
+def order_item_index_pending(conn) -> bool:
+    return column_exists(conn, "orderitem", "id") and conn.execute(text(
+        "SELECT to_regclass('ix_orderitem_order_id_created_at') IS NULL"
+    )).scalar()
+
+def migrate_order_item_index(conn):
+    """Index orderitem's foreign key to its order"""
+    conn.execute(text("CREATE INDEX ix_orderitem_order_id_created_at ON orderitem (order_id, created_at)"))
+
+def order_number_unique_pending(conn) -> bool:
+    if not column_exists(conn, "order", "order_number"):
+        return False
+    return not conn.execute(text(
+        "SELECT indisunique FROM pg_index WHERE indexrelid = to_regclass('ix_order_order_number')"
+    )).scalar()
+
+def migrate_order_number_unique(conn):
+    """Replace the plain order_number index with a unique one"""
+    duplicates = conn.execute(text(
+        'SELECT COUNT(*) FROM (SELECT order_number FROM "order" GROUP BY order_number HAVING COUNT(*) > 1) AS d'
+    )).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} order numbers are used by more than one order; renumber them before "
+            'migrating (SELECT order_number FROM "order" GROUP BY order_number HAVING COUNT(*) > 1)'
+        )
+    partitioned = conn.execute(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = CAST('\"order\"' AS regclass)"
+    )).scalar()
+    # Unique indexes on a partitioned table must include the partition key
+    columns = "order_number, created_at" if partitioned else "order_number"
+    conn.execute(text("DROP INDEX IF EXISTS ix_order_order_number"))
+    conn.execute(text(f'CREATE UNIQUE INDEX ix_order_order_number ON "order" ({columns})'))
+
+MIGRATIONS = [
+    ("order_item_keys", order_item_keys_pending, migrate_order_item_keys),
+    ("order_number_bigint", order_number_bigint_pending, migrate_order_number_bigint),
+    ("order_totals", order_totals_pending, migrate_order_totals),
+    ("order_number_unique", order_number_unique_pending, migrate_order_number_unique),
+    ("order_item_index", order_item_index_pending, migrate_order_item_index),
+]
+
+def pending_migrations(engine) -> list[str]:
+    with engine.connect() as conn:
+        return [name for name, is_pending, _ in MIGRATIONS if is_pending(conn)]
+
+def run_migrations(engine):
+    with advisory_lock(engine, MIGRATIONS_LOCK):
+        for name, is_pending, apply in MIGRATIONS:
+            with engine.begin() as conn:
+                if not is_pending(conn):
+                    continue
+                print(f"[DEBUG] Applying migration {name}")
+                apply(conn)
+
+# Run before starting a new version on an existing database:
+# python -m app.utils.migrations
+
+if __name__ == "__main__":
+    from sqlmodel import SQLModel
+    from app.configs.database import engine
+    SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
@@ -0,0 +1,17 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+# Amounts are stored as integers in minor units (1 Rs. = 100 paisa)
+MINOR_UNITS = 100
+
+def to_minor_units(amount) -> int:
+    """Convert a price from the products API (int, float or string) to minor units"""
+    return int((Decimal(str(amount)) * MINOR_UNITS).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+def format_amount(minor: int) -> str:
+    return f"{Decimal(minor) / MINOR_UNITS:.2f}"
+
+def to_major_units(minor: int) -> int | float:
+    """Rupees as the API reported them before totals were stored in paisa: whole amounts stay ints"""
+    if minor % MINOR_UNITS == 0:
+        return minor // MINOR_UNITS
+    return float(Decimal(minor) / MINOR_UNITS)
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+import redis.asyncio as redis
+from app.configs.config import settings
+
+# Snowflake-style layout of a 63-bit order number (fits a signed BIGINT):
+#   41 bits milliseconds since EPOCH | 10 bits worker id | 12 bits sequence
+EPOCH_MS = int(datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+WORKER_LEASE_KEY = "order-service:worker:{}"
+
+class OrderNumberGenerator:
+    """Allocates unique, time-sortable order numbers without touching the database.
+
+    Uniqueness across processes and instances comes from the worker id, which
+    every process must lease through init_order_number_generator() (or be given
+    explicitly) before generating numbers. A leased id is only used until
+    lease_expires (monotonic time), which the heartbeat keeps pushing forward.
+    """
+
+    def __init__(self, worker_id: int | None = None):
+        self.worker_id = None
+        self.lease_expires: float | None = None
+        self.last_ms = -1
+        self.sequence = 0
+        self.lock = threading.Lock()
+        if worker_id is not None:
+            self.set_worker_id(worker_id)
+
+    def set_worker_id(self, worker_id: int, lease_expires: float | None = None):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}, got {worker_id}")
+        with self.lock:
+            self.worker_id = worker_id
+            self.lease_expires = lease_expires
+
+    @staticmethod
+    def _now_ms() -> int:
+        return time.time_ns() // 1_000_000 - EPOCH_MS
+
+    def next_id(self) -> int:
+        if self.worker_id is None:
+            raise RuntimeError("Order number generator has no worker id; call init_order_number_generator() first")
+        with self.lock:
+            if self.lease_expires is not None and time.monotonic() >= self.lease_expires:
+                raise RuntimeError(f"Lease on worker id {self.worker_id} expired; order numbers are unavailable")
+            now = self._now_ms()
+            if now < self.last_ms:
+                # Clock moved backwards: keep issuing from the last timestamp instead of reusing old ones
+                now = self.last_ms
+            if now == self.last_ms:
+                self.sequence = (self.sequence + 1) & MAX_SEQUENCE
+                if self.sequence == 0:
+                    # Sequence exhausted for this millisecond, wait for the next one
+                    while now <= self.last_ms:
+                        now = self._now_ms()
+            else:
+                self.sequence = 0
+            self.last_ms = now
+            return (now << (WORKER_ID_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self.sequence
+
+def order_number_timestamp(order_number: int) -> datetime:
+    ms = (order_number >> (WORKER_ID_BITS + SEQUENCE_BITS)) + EPOCH_MS
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+order_numbers = OrderNumberGenerator()
+
+# Renew or delete a worker id key only while this process still holds it
+RENEW_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+class WorkerIdLease:
+    """Holds one worker id slot in Redis (SET NX with a TTL) and keeps it alive.
+
+    The heartbeat renews the key every third of the lease. If renewals keep
+    failing, the generator stops issuing numbers when its lease runs out, since
+    Redis may hand the id to another process after that.
+    """
+
+    def __init__(self, generator: OrderNumberGenerator, lease_seconds: float):
+        self.generator = generator
+        self.lease_seconds = lease_seconds
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+        self.redis_client = None
+        self.worker_id: int | None = None
+        self.heartbeat_task: asyncio.Task | None = None
+
+    async def _try_slot(self, worker_id: int) -> bool:
+        # Taken before the request, so the local lease never outlives the Redis key
+        started = time.monotonic()
+        acquired = await self.redis_client.set(
+            WORKER_LEASE_KEY.format(worker_id), self.token, nx=True, px=int(self.lease_seconds * 1000)
+        )
+        if acquired:
+            self.worker_id = worker_id
+            self.generator.set_worker_id(worker_id, started + self.lease_seconds)
+        return bool(acquired)
+
+    async def acquire(self, fixed_worker_id: int | None = None) -> int:
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
+        if fixed_worker_id is not None:
+            if not await self._try_slot(fixed_worker_id):
+                raise RuntimeError(
+                    f"ORDER_WORKER_ID={fixed_worker_id} is already leased by another process. "
+                    "Every process needs its own worker id, so leave ORDER_WORKER_ID unset "
+                    "when running several uvicorn workers."
+                )
+            return self.worker_id
+        # Start at a random slot so processes starting together don't contend for the same keys
+        start = random.randrange(MAX_WORKER_ID + 1)
+        for offset in range(MAX_WORKER_ID + 1):
+            if await self._try_slot((start + offset) % (MAX_WORKER_ID + 1)):
+                return self.worker_id
+        raise RuntimeError(f"All {MAX_WORKER_ID + 1} order number worker ids are leased")
+
+    async def renew(self) -> bool:
+        started = time.monotonic()
+        renewed = await self.redis_client.eval(
+            RENEW_LEASE_SCRIPT, 1, WORKER_LEASE_KEY.format(self.worker_id),
+            self.token, int(self.lease_seconds * 1000),
+        )
+        if renewed:
+            self.generator.set_worker_id(self.worker_id, started + self.lease_seconds)
+        return bool(renewed)
+
+    async def heartbeat(self, fixed_worker_id: int | None = None):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                if not await self.renew():
+                    print(f"[DEBUG] Lost the lease on worker id {self.worker_id}, leasing a new one")
+                    await self.acquire(fixed_worker_id)
+                    print(f"[DEBUG] Order number generator using worker id {self.worker_id}")
+            except Exception as e:
+                print(f"[DEBUG] Failed to renew worker id lease: {e}")
+
+    async def release(self):
+        if self.heartbeat_task:
+            self.heartbeat_task.cancel()
+        if self.redis_client is None or self.worker_id is None:
+            return
+        await self.redis_client.eval(RELEASE_LEASE_SCRIPT, 1, WORKER_LEASE_KEY.format(self.worker_id), self.token)
+        await self.redis_client.aclose()
+
+order_number_lease = WorkerIdLease(order_numbers, settings.ORDER_WORKER_LEASE_SECONDS)
+
+async def init_order_number_generator():
+    """Lease this process a worker id in Redis: ORDER_WORKER_ID if set, otherwise the first free one.
+
+    Each uvicorn worker runs the startup hook, so every process holds its own id,
+    at the cost of one Redis round-trip per heartbeat and none per order. A fixed
+    ORDER_WORKER_ID can only be held by one process, so a second process with the
+    same id (e.g. uvicorn --workers N) fails to start instead of issuing duplicates.
+    """
+    worker_id = await order_number_lease.acquire(settings.ORDER_WORKER_ID)
+    order_number_lease.heartbeat_task = asyncio.create_task(order_number_lease.heartbeat(settings.ORDER_WORKER_ID))
+    print(f"[DEBUG] Order number generator using worker id {worker_id}")
+
+async def release_order_number_lease():
+    await order_number_lease.release()
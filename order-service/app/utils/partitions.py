@@ -0,0 +1,82 @@
+import re
+from datetime import date, datetime
+from sqlalchemy import text
+from app.configs.config import settings
+
+# Parents first when creating, children first when dropping (orderitem references order)
+PARTITIONED_TABLES = ("order", "orderitem")
+PARTITION_NAME = re.compile(r"_y(\d{4})m(\d{2})$")
+
+def month_start(day: date, offset: int = 0) -> date:
+    month = day.year * 12 + (day.month - 1) + offset
+    return date(month // 12, month % 12 + 1, 1)
+
+def partition_name(table: str, start: date) -> str:
+    return f"{table}_y{start.year:04d}m{start.month:02d}"
+
+def check_partitioned(engine):
+    """Refuse to run partition maintenance against tables created without partitioning"""
+    with engine.connect() as conn:
+        plain = conn.execute(text(
+            "SELECT relname FROM pg_class WHERE relname IN ('order', 'orderitem') AND relkind = 'r'"
+        )).scalars().all()
+    if plain:
+        raise RuntimeError(
+            f"ORDER_PARTITIONING is enabled but {plain} already exist as plain tables. "
+            "Existing tables are not converted automatically; see 'Order storage' in the README "
+            "for moving the data into partitioned tables, or unset ORDER_PARTITIONING."
+        )
+
+def ensure_partitions(engine, months_ahead: int | None = None, today: date | None = None):
+    """Create monthly partitions from the current month up to months_ahead in the future"""
+    if months_ahead is None:
+        months_ahead = settings.ORDER_PARTITION_MONTHS_AHEAD
+    today = today or date.today()
+    created = []
+    with engine.begin() as conn:
+        for offset in range(months_ahead + 1):
+            start = month_start(today, offset)
+            end = month_start(today, offset + 1)
+            for table in PARTITIONED_TABLES:
+                name = partition_name(table, start)
+                conn.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                ))
+                created.append(name)
+    print(f"[DEBUG] Ensured order partitions: {created}")
+    return created
+
+def list_partitions(conn, table: str) -> list[str]:
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {"table": table})
+    return [row[0] for row in rows]
+
+def drop_partitions_before(engine, cutoff: datetime):
+    """Detach and drop monthly partitions that end on or before cutoff.
+
+    Meant to run after archival has moved their rows out; partitions that still hold rows are kept.
+    """
+    dropped = []
+    with engine.begin() as conn:
+        for table in reversed(PARTITIONED_TABLES):
+            for name in list_partitions(conn, table):
+                match = PARTITION_NAME.search(name)
+                if not match:
+                    continue
+                start = date(int(match.group(1)), int(match.group(2)), 1)
+                if datetime.combine(month_start(start, 1), datetime.min.time()) > cutoff:
+                    continue
+                if conn.execute(text(f'SELECT EXISTS (SELECT 1 FROM "{name}")')).scalar():
+                    # Rows skipped by archival (e.g. locked at the time) keep the partition alive
+                    continue
+                conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+                conn.execute(text(f'DROP TABLE "{name}"'))
+                dropped.append(name)
+    if dropped:
+        print(f"[DEBUG] Dropped archived order partitions: {dropped}")
+    return dropped
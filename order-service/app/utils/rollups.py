@@ -0,0 +1,101 @@
+import json
+from collections import Counter
+from sqlalchemy import text
+from sqlmodel import Session
+from app.configs.config import settings
+from app.models import Order
+
+RECORD_ORDER_SQL = text("""
+INSERT INTO user_order_summary (user_id, order_count, lifetime_total, last_order_at, status_counts)
+VALUES (:user_id, 1, :total_amount, :created_at, jsonb_build_object(CAST(:status AS text), 1))
+ON CONFLICT (user_id) DO UPDATE SET
+    order_count = user_order_summary.order_count + 1,
+    lifetime_total = user_order_summary.lifetime_total + EXCLUDED.lifetime_total,
+    last_order_at = GREATEST(user_order_summary.last_order_at, EXCLUDED.last_order_at),
+    status_counts = user_order_summary.status_counts || jsonb_build_object(
+        CAST(:status AS text),
+        COALESCE((user_order_summary.status_counts ->> CAST(:status AS text))::int, 0) + 1
+    )
+""")
+
+REBUILD_SQL = text("""
+INSERT INTO user_order_summary (user_id, order_count, lifetime_total, last_order_at, status_counts)
+SELECT user_id, SUM(n), SUM(total), MAX(last_order_at), jsonb_object_agg(status, n)
+FROM (
+    SELECT user_id, status, COUNT(*) AS n, SUM(total_amount) AS total, MAX(created_at) AS last_order_at
+    FROM (
+        SELECT user_id, status, total_amount, created_at FROM "order"
+        UNION ALL
+        SELECT user_id, status, total_amount, created_at FROM order_archive
+    ) AS orders
+    GROUP BY user_id, status
+) AS per_status
+GROUP BY user_id
+""")
+
+# The SET expression reads s itself, so a row changed concurrently (e.g. by
+# create_order) is re-evaluated against its latest version instead of losing counts
+APPLY_STATUS_DELTAS_SQL = text("""
+UPDATE user_order_summary AS s
+SET status_counts = s.status_counts || (
+    SELECT jsonb_object_agg(d.key, COALESCE((s.status_counts ->> d.key)::int, 0) + d.value::int)
+    FROM jsonb_each_text(v.deltas) AS d
+)
+FROM jsonb_to_recordset(CAST(:deltas AS jsonb)) AS v(user_id text, deltas jsonb)
+WHERE s.user_id = v.user_id
+""")
+
+LOCK_SUMMARIES_SQL = text("""
+SELECT user_id FROM user_order_summary
+WHERE user_id = ANY(:user_ids)
+ORDER BY user_id
+FOR UPDATE
+""")
+
+def record_order(db: Session, order: Order):
+    """Add a new order to its user's rollup; runs inside the caller's transaction"""
+    db.exec(RECORD_ORDER_SQL, params={
+        "user_id": order.user_id,
+        "total_amount": order.total_amount,
+        "created_at": order.created_at,
+        "status": order.status,
+    })
+
+def apply_status_deltas(db: Session, deltas: Counter):
+    """Shift status counts for many users in one statement; deltas maps (user_id, status) to a change"""
+    per_user: dict[str, dict[str, int]] = {}
+    for (user_id, status), delta in deltas.items():
+        if delta:
+            per_user.setdefault(user_id, {})[status] = delta
+    if per_user:
+        user_ids = sorted(per_user)
+        # The UPDATE's join order is up to the planner, so take the row locks
+        # first in user_id order; concurrent callers then can't deadlock
+        db.exec(LOCK_SUMMARIES_SQL, params={"user_ids": user_ids})
+        rows = [{"user_id": user_id, "deltas": per_user[user_id]} for user_id in user_ids]
+        db.exec(APPLY_STATUS_DELTAS_SQL, params={"deltas": json.dumps(rows)})
+
+def rebuild_rollups(engine, allow_incomplete: bool = False):
+    """Recompute every user's rollup from the orders in one set-based statement"""
+    if settings.ORDER_ARCHIVE_BACKEND == "file" and not allow_incomplete:
+        # Orders archived to files can't be read back in SQL; rebuilding would
+        # replace correct lifetime totals with ones missing those orders
+        raise RuntimeError(
+            "Refusing to rebuild rollups with ORDER_ARCHIVE_BACKEND=file: archived orders would be "
+            "left out of every total. Pass --allow-incomplete to rebuild from the database only."
+        )
+    with engine.begin() as conn:
+        conn.execute(text("LOCK TABLE user_order_summary IN EXCLUSIVE MODE"))
+        conn.execute(text("DELETE FROM user_order_summary"))
+        rebuilt = conn.execute(REBUILD_SQL).rowcount
+    print(f"[DEBUG] Rebuilt order rollups for {rebuilt} users")
+    return rebuilt
+
+# To recompute all rollups (e.g. once after migrating an existing database), use:
+# python -m app.utils.rollups [--allow-incomplete]
+
+if __name__ == "__main__":
+    from app.configs.database import engine, create_db_and_tables
+    create_db_and_tables()
+    import sys
+    rebuild_rollups(engine, allow_incomplete="--allow-incomplete" in sys.argv[1:])
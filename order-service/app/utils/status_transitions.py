@@ -0,0 +1,20 @@
+# Allowed order status changes; anything not listed here is rejected
+STATUS_TRANSITIONS = {
+    "pending": {"paid", "cancelled"},
+    "paid": {"shipped", "cancelled"},
+    "shipped": {"delivered"},
+    "delivered": set(),
+    "cancelled": set(),
+}
+
+def can_transition(current: str, new: str) -> bool:
+    return new in STATUS_TRANSITIONS.get(current, set())
+
+def is_ahead(current: str, new: str) -> bool:
+    """True when new is reachable from current, but only through other statuses first"""
+    seen = set()
+    frontier = set(STATUS_TRANSITIONS.get(current, set()))
+    while frontier:
+        seen |= frontier
+        frontier = {after for status in frontier for after in STATUS_TRANSITIONS[status]} - seen
+    return new in seen and not can_transition(current, new)
@@ -1,13 +1,20 @@
 import httpx
 from app.configs.config import settings
+from app.utils.circuit_breaker import auth_breaker
+from app.utils.load_shedding import time_remaining
 
-async def verify_user_token(token: str):
+async def _post_verify_token(token: str):
     url = f"{settings.AUTH_SERVICE}/api/verify-token/"
-    async with httpx.AsyncClient() as client:
+    async with httpx.AsyncClient(timeout=time_remaining(settings.UPSTREAM_TIMEOUT_SECONDS)) as client:
         response = await client.post(
             url,
             json={"token": token}
         )
+        if response.status_code >= 500:
+            response.raise_for_status()
         if response.status_code == 200:
             return response.json()
-        return None 
\ No newline at end of file
+        return None
+
+async def verify_user_token(token: str):
+    return await auth_breaker.call(_post_verify_token, token)
@@ -0,0 +1,50 @@
+# Stress test for the order number generator: several processes (one worker id
+# each, like uvicorn workers) with several threads each generate ids
+# concurrently, then all ids are checked for collisions and per-thread ordering.
+#
+# Run from the order-service directory:
+#   python test/order_number_stress.py [processes] [threads] [ids_per_thread]
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.order_number import OrderNumberGenerator
+
+def generate(generator: OrderNumberGenerator, count: int) -> array:
+    ids = array("q")
+    for _ in range(count):
+        ids.append(generator.next_id())
+    return ids
+
+def run_worker(worker_id: int, threads: int, ids_per_thread: int) -> list[bytes]:
+    generator = OrderNumberGenerator(worker_id)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda _: generate(generator, ids_per_thread), range(threads)))
+    return [ids.tobytes() for ids in results]
+
+def main(processes: int = 4, threads: int = 4, ids_per_thread: int = 125_000):
+    total = processes * threads * ids_per_thread
+    print(f"Generating {total} order numbers: {processes} processes x {threads} threads x {ids_per_thread}")
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(run_worker, worker_id, threads, ids_per_thread) for worker_id in range(processes)]
+        batches = [batch for future in futures for batch in future.result()]
+    elapsed = time.perf_counter() - started
+
+    seen = set()
+    for batch in batches:
+        ids = array("q")
+        ids.frombytes(batch)
+        assert all(a < b for a, b in zip(ids, ids[1:])), "ids from one thread are not increasing"
+        seen.update(ids)
+    collisions = total - len(seen)
+    print(f"Generated {total} ids in {elapsed:.2f}s ({total / elapsed:,.0f} ids/s), collisions: {collisions}")
+    assert collisions == 0, f"{collisions} duplicate order numbers"
+    assert max(seen) < 2 ** 63, "order number does not fit a signed 64-bit column"
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
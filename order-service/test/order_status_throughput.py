@@ -0,0 +1,127 @@
+# Throughput test for the order status consumer. A local stand-in for the
+# broker delivers order.status.* messages with the same prefetch window as
+# RabbitMQ (a delivered message holds a slot until it is acked or rejected),
+# so the measured rate is what the consumer can apply against DATABASE_URL.
+# Every order goes pending -> paid -> shipped -> delivered, and one event in
+# ten is an early pending -> delivered jump, which is requeued once and then
+# rejected, as are a handful of events whose status is not a string.
+#
+# Run from the order-service directory against a Postgres database:
+#   python test/order_status_throughput.py [orders]
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import Session, select, delete
+from app.configs.config import settings
+from app.configs.database import create_db_and_tables, engine
+from app.consumers.order_status import OrderStatusConsumer
+from app.models import Order, UserOrderSummary
+from app.utils.order_number import OrderNumberGenerator
+from app.utils.rollups import record_order
+
+TEST_USER = "order-status-throughput"
+
+class StandInBroker:
+    def __init__(self, prefetch: int):
+        self.window = asyncio.Semaphore(prefetch)
+        self.acked = 0
+        self.rejected = 0
+        self.requeued = 0
+        self.settled = 0
+        self.done = asyncio.Event()
+        self.expected = 0
+
+    def settle(self):
+        self.settled += 1
+        self.window.release()
+        if self.settled == self.expected:
+            self.done.set()
+
+    async def deliver(self, consumer: OrderStatusConsumer, events: list[tuple[int, object]]):
+        self.consumer = consumer
+        self.expected = len(events)
+        for order_number, status in events:
+            await self.window.acquire()
+            await consumer.handle(StandInMessage(self, order_number, status))
+
+class StandInMessage:
+    def __init__(self, broker: StandInBroker, order_number: int, status: object):
+        self.broker = broker
+        self.redelivered = False
+        self.routing_key = f"order.status.{status}"
+        self.body = json.dumps({"order_number": str(order_number), "status": status}).encode()
+
+    async def ack(self):
+        self.broker.acked += 1
+        self.broker.settle()
+
+    async def reject(self, requeue: bool = False):
+        self.broker.rejected += 1
+        self.broker.settle()
+
+    async def nack(self, requeue: bool = True):
+        if not requeue:
+            raise RuntimeError("events are only nacked to be requeued")
+        # Redeliver at the back of the queue; the message keeps its prefetch slot
+        self.broker.requeued += 1
+        self.redelivered = True
+        asyncio.ensure_future(self.broker.consumer.handle(self))
+
+def create_orders(count: int) -> list[int]:
+    generator = OrderNumberGenerator(1023)
+    order_numbers = [generator.next_id() for _ in range(count)]
+    with Session(engine) as db:
+        for order_number in order_numbers:
+            order = Order(user_id=TEST_USER, order_number=order_number, total_amount=100)
+            db.add(order)
+            record_order(db, order)
+        db.commit()
+    return order_numbers
+
+def cleanup():
+    with Session(engine) as db:
+        db.exec(delete(Order).where(Order.user_id == TEST_USER))
+        db.exec(delete(UserOrderSummary).where(UserOrderSummary.user_id == TEST_USER))
+        db.commit()
+
+async def main(orders: int = 20_000):
+    create_db_and_tables()
+    cleanup()
+    order_numbers = create_orders(orders)
+    events = [(n, "delivered") for n in order_numbers[::10]]
+    for status in ("paid", "shipped", "delivered"):
+        events += [(n, status) for n in order_numbers]
+    malformed = [(n, [status]) for n, status in events[:10]]
+    events = malformed + events
+    illegal = len(order_numbers[::10]) + len(malformed)
+
+    consumer = OrderStatusConsumer(engine)
+    broker = StandInBroker(settings.ORDER_STATUS_PREFETCH)
+    batch_task = asyncio.create_task(consumer.run_batches())
+    started = time.perf_counter()
+    await broker.deliver(consumer, events)
+    await broker.done.wait()
+    elapsed = time.perf_counter() - started
+    batch_task.cancel()
+
+    print(
+        f"Applied {broker.acked}, rejected {broker.rejected} and requeued {broker.requeued} of {len(events)} events "
+        f"in {elapsed:.2f}s over {consumer.batches} batches: {len(events) / elapsed:,.0f} events/s"
+    )
+    with Session(engine) as db:
+        statuses = set(db.exec(select(Order.status).where(Order.user_id == TEST_USER)).all())
+        summary = db.get(UserOrderSummary, TEST_USER)
+    cleanup()
+    assert broker.rejected == illegal, f"expected {illegal} rejected events, got {broker.rejected}"
+    assert broker.acked == len(events) - illegal
+    assert statuses == {"delivered"}, statuses
+    assert summary.status_counts.get("delivered") == orders, summary.status_counts
+    assert not any(summary.status_counts.get(s) for s in ("pending", "paid", "shipped")), summary.status_counts
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:])))